@@ -14,16 +14,32 @@ Note:
 - The server_ip and server_port variables should be set to the IP address and port of the server.
 - The client will connect to the server and send messages entered by the user in the command prompt.
 - Messages received from the server will be printed to the console.
+- On Linux/macOS a single thread waits on both the socket and stdin with a selector. Windows
+  cannot select() on stdin, so there a background thread receives messages instead.
 - Don't try to run this script on WSL, use a native Windows or Linux environment.
 """
+import selectors
 import socket
+import sys
 import threading
+from stdin_lines import StdinLineReader
+PROMPT = "Enter message to send (or press Enter to skip): "
+SOCKET_BUFFER_SIZE = 1 << 20  # 1 MiB send/receive buffers
+RECEIVE_BUFFER_SIZE = 4096
+def tune_tcp_socket(sock):
+    # Disable Nagle's algorithm so small messages are sent immediately, and enlarge socket buffers
+    if hasattr(socket, "TCP_NODELAY"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
 def receive_messages(client_socket):
+    # Preallocated receive buffer, reused for every recv
+    rxview = memoryview(bytearray(RECEIVE_BUFFER_SIZE))
     while True:
         try:
-            data = client_socket.recv(1024)
-            if data:
-                print(f"Received: {data.decode('utf-8')}")
+            nbytes = client_socket.recv_into(rxview, RECEIVE_BUFFER_SIZE)
+            if nbytes:
+                print(f"Received: {str(rxview[:nbytes], 'utf-8', 'replace')}")
             else:
                 break
         except:
@@ -31,25 +47,73 @@ def receive_messages(client_socket):
 def start_tcp_client(server_ip, server_port):
     # Create a TCP/IP socket
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    tune_tcp_socket(client_socket)
     
     # Connect the socket to the server's address and port
     client_socket.connect((server_ip, server_port))
     print(f"Connected to {server_ip}:{server_port}")
     
+    try:
+        if sys.platform == 'win32':
+            run_threaded_client(client_socket)
+        else:
+            run_selector_client(client_socket)
+    finally:
+        # Clean up the connection
+        client_socket.close()
+def run_threaded_client(client_socket):
     # Start a thread to receive messages
     receive_thread = threading.Thread(target=receive_messages, args=(client_socket,))
     receive_thread.daemon = True
     receive_thread.start()
     
+    while True:
+        # Send data to the server if needed
+        message = input(PROMPT)
+        if message:
+            client_socket.sendall(message.encode('utf-8'))
+def run_selector_client(client_socket):
+    # Wait on both the socket and stdin from this single thread
+    client_socket.setblocking(False)
+    sel = selectors.DefaultSelector()
+    sel.register(client_socket, selectors.EVENT_READ, data="sock")
+    send = client_socket.sendall  # Skip the attribute lookup on every message
+    # Preallocated receive buffer, reused for every recv
+    rxview = memoryview(bytearray(RECEIVE_BUFFER_SIZE))
+    stdin_reader = StdinLineReader()
+    
     try:
+        print(PROMPT, end='', flush=True)
+        try:
+            sel.register(sys.stdin, selectors.EVENT_READ, data="stdin")
+        except PermissionError:
+            # epoll rejects a regular file or /dev/null, reads from it never block,
+            # so send all of it now and keep receiving
+            for message in stdin_reader.read_remaining():
+                if message:
+                    send(message.encode('utf-8'))
         while True:
-            # Send data to the server if needed
-            message = input("Enter message to send (or press Enter to skip): ")
-            if message:
-                client_socket.sendall(message.encode('utf-8'))
+            for key, _ in sel.select():
+                if key.data == "sock":
+                    try:
+                        nbytes = client_socket.recv_into(rxview, RECEIVE_BUFFER_SIZE)
+                    except BlockingIOError:
+                        continue
+                    if not nbytes:
+                        print("\nServer disconnected")
+                        return
+                    print(f"Received: {str(rxview[:nbytes], 'utf-8', 'replace')}")
+                else:
+                    for message in stdin_reader.read_lines():
+                        # Send data to the server if needed
+                        if message:
+                            send(message.encode('utf-8'))
+                        if not stdin_reader.closed:
+                            print(PROMPT, end='', flush=True)
+                    if stdin_reader.closed:
+                        sel.unregister(sys.stdin)  # stdin closed, keep receiving
     finally:
-        # Clean up the connection
-        client_socket.close()
+        sel.close()
 if __name__ == "__main__":
     server_ip = '192.168.50.50'  # Replace with the IP address of your Pico W
     server_port = 8080          # Replace with the port your Pico W server is listening on
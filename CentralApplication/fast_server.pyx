@@ -0,0 +1,67 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+fast_server.pyx
+Optional Cython extension with the receive hot loop of server_TCP.py.
+drain() reads what is currently available on a non-blocking socket in a C loop,
+without going through the socket object or the bytecode interpreter for each recv,
+and only calls back into Python once per received chunk.
+Build (from this directory):
+    cythonize -i -3 -X boundscheck=False fast_server.pyx
+Dependencies:
+- Requires Cython and a C compiler to build, Linux/macOS only.
+Note:
+- drain() returns after max_chunks receives even if more data is pending, so a fast sender
+  cannot keep the caller's selector loop (and user input) waiting. The level-triggered
+  selector reports the socket again and the next call continues.
+- server_TCP.py uses this module automatically when it can be imported and falls back to
+  its pure Python recv_into() loop otherwise.
+"""
+import os
+
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from libc.errno cimport errno
+
+cdef extern from "errno.h":
+    int EAGAIN
+    int EWOULDBLOCK
+    int EINTR
+
+cdef extern from "sys/socket.h" nogil:
+    ssize_t recv(int sockfd, void *buf, size_t len, int flags)
+    int MSG_DONTWAIT
+
+# Size of the stack buffer, larger bufsz values are clamped to it
+cdef enum:
+    MAX_BUFFER_SIZE = 65536
+
+cpdef Py_ssize_t drain(int fd, object cb, size_t bufsz=4096, int max_chunks=16) except? -2:
+    """Receive until the socket would block or max_chunks chunks were read, calling cb(bytes)
+    per chunk. Returns the number of bytes received, or -1 if the peer closed the connection."""
+    cdef char buf[MAX_BUFFER_SIZE]
+    cdef ssize_t n
+    cdef int err
+    cdef int chunks = 0
+    cdef Py_ssize_t total = 0
+
+    if bufsz > MAX_BUFFER_SIZE:
+        bufsz = MAX_BUFFER_SIZE
+
+    while True:
+        with nogil:
+            n = recv(fd, buf, bufsz, MSG_DONTWAIT)
+        if n > 0:
+            total += n
+            if cb is not None:
+                cb(PyBytes_FromStringAndSize(buf, n))
+            chunks += 1
+            if chunks >= max_chunks:
+                return total
+        elif n == 0:
+            return -1
+        else:
+            err = errno
+            if err == EINTR:
+                continue
+            if err == EAGAIN or err == EWOULDBLOCK:
+                return total
+            raise OSError(err, os.strerror(err))
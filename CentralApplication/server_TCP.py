@@ -1,13 +1,14 @@
 """
 server_TCP.py
 
-This script implements a simple TCP server using Python's socket and threading modules. 
+This script implements a simple TCP server using Python's socket and selectors modules. 
 The server listens for incoming connections, accepts messages from connected clients, 
 and allows the user to send messages back to the clients through a command-line interface.
 
 Usage:
 1. Run the script using Python 3.
    Example: python server_TCP.py
+   To run N worker processes instead (Linux): python server_TCP.py N
 2. The server will start and listen on the specified host and port (default: 0.0.0.0:8080).
 3. To send a message to the connected client, type the message in the command prompt and press Enter.
 4. To exit the server, type 'quit' and press Enter.
@@ -17,19 +18,85 @@ Key Features:
 - Receives and displays messages from the client.
 - Allows the user to send messages to the connected client.
 - Handles disconnections and errors gracefully.
+- Runs in a single thread: the listening socket, the client socket and stdin are all
+  dispatched from one selector loop (on Windows, where stdin cannot be selected,
+  user input is read in a background thread instead).
+- Optional multi-process mode (Linux): start(workers=N), or a worker count given on the
+  command line, forks N receive-only worker
+  processes, each pinned to one CPU with its own SO_REUSEPORT listening socket, so the
+  kernel spreads incoming connections across cores. Workers accept any number of clients
+  and only display received messages, there is no command prompt in this mode.
 
 Dependencies:
 - Requires Python 3.x.
 - No external libraries are needed beyond the standard library.
+- Optionally, build fast_server.pyx with Cython to receive through a C loop instead of Python.
 
 Note:
 - You can modify the 'host' and 'port' parameters when creating the TCPServer instance
   to customize the server's listening address and port.
 """
 
+import logging
+import logging.handlers
+import os
+import queue
+import selectors
+import signal
 import socket
+import sys
 import threading
-import time
+import traceback
+
+from stdin_lines import StdinLineReader
+
+try:
+    import fast_server  # Optional Cython receive loop, see fast_server.pyx
+except ImportError:
+    fast_server = None
+
+SOCKET_BUFFER_SIZE = 1 << 20  # 1 MiB send/receive buffers
+RECEIVE_BUFFER_SIZE = 4096
+WORKER_BACKLOG = 128  # Listen backlog of each worker process
+PROMPT = "Enter message to send (or 'quit' to exit): "
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Enqueue the record as is, so '%' formatting happens on the listener thread
+        return record
+
+# Queued in place of a log record to have the listener thread write the input prompt
+_PROMPT_MARK = object()
+
+class _ConsoleListener(logging.handlers.QueueListener):
+    def handle(self, record):
+        if record is _PROMPT_MARK:
+            # Written in queue order after the preceding log lines, but outside of logging
+            sys.stdout.write(PROMPT)
+            sys.stdout.flush()
+        else:
+            super().handle(record)
+
+def start_log_listener():
+    """Write this module's log records to stdout from a background thread, returns the listener"""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = _ConsoleListener(log_queue, handler)
+    log.handlers[:] = [_DeferredQueueHandler(log_queue)]
+    log.propagate = False
+    listener.start()
+    return listener
+
+def tune_tcp_socket(sock):
+    # Disable Nagle's algorithm so small messages are sent immediately, and enlarge socket buffers
+    if hasattr(socket, "TCP_NODELAY"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
 
 class TCPServer:
     def __init__(self, host='0.0.0.0', port=8080):
@@ -38,116 +105,338 @@ class TCPServer:
         self.server_socket = None
         self.client_socket = None
         self.client_address = None
+        self.selector = None
         self.running = False
+        self.worker_pids = []
+        # Log listener started by start() when no handler was configured for this module
+        self._log_listener = None
+        # Socket pair used by the Windows command thread to wake up the selector
+        self._wakeup_r = None
+        self._wakeup_w = None
+        # Preallocated receive buffer, reused for every recv
+        self._rxbuf = bytearray(RECEIVE_BUFFER_SIZE)
+        self._rxview = memoryview(self._rxbuf)
+        self._stdin_reader = None
         
-    def start(self):
-        """Start the TCP server"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # Allow port reuse
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(1)
-        self.running = True
+    def start(self, workers=1):
+        """Start the TCP server, with workers > 1 fork that many receive-only worker processes"""
+        if workers > 1:
+            # Fork before the log listener thread exists, children only inherit the calling thread
+            self._start_workers(workers)
+        if not log.handlers:
+            self._log_listener = start_log_listener()
+        if workers > 1:
+            log.info("Started %d worker processes for %s:%s", workers, self.host, self.port)
+            return
         
-        print(f"Server listening on {self.host}:{self.port}")
+        self.server_socket = self._create_listener(1)
+        self.running = True
         
-        # Start receive thread
-        receive_thread = threading.Thread(target=self.receive_messages)
-        receive_thread.daemon = True
-        receive_thread.start()
+        log.info("Server listening on %s:%s", self.host, self.port)
         
-        # Start command input thread
-        command_thread = threading.Thread(target=self.command_loop)
-        command_thread.daemon = True
-        command_thread.start()
+        # Each registration carries the handler to call when the file object is readable
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server_socket, selectors.EVENT_READ, self._do_accept)
         
-    def receive_messages(self):
-        """Handle incoming connections and messages"""
-        while self.running:
+        if sys.platform == 'win32':
+            # Windows cannot select() on stdin, read user input in a thread instead.
+            # The thread wakes up the selector through a socket pair when it is time to stop.
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self.selector.register(self._wakeup_r, selectors.EVENT_READ, self._do_wakeup)
+            command_thread = threading.Thread(target=self.command_loop)
+            command_thread.daemon = True
+            command_thread.start()
+        else:
+            self._stdin_reader = StdinLineReader()
             try:
-                # Wait for connection
-                print("Waiting for connection...")
-                self.client_socket, self.client_address = self.server_socket.accept()
-                print(f"Connected to client: {self.client_address}")
-                
-                # Receive messages
-                while self.running:
+                self.selector.register(sys.stdin, selectors.EVENT_READ, self._do_command)
+            except PermissionError:
+                pass  # epoll rejects a regular file or /dev/null, handled below
+        
+        log.info("Waiting for connection...")
+        if sys.platform != 'win32':
+            self._show_prompt()
+            if sys.stdin not in self.selector.get_map():
+                # Reads from such stdin never block, so handle all of it now and keep
+                # serving without user input afterwards
+                self._handle_commands(self._stdin_reader.read_remaining())
+        
+    def _create_listener(self, backlog):
+        """Create a non-blocking listening socket"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Allow port reuse
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Allow several listening sockets on the same port where supported (worker processes)
+        if hasattr(socket, "SO_REUSEPORT"):
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        tune_tcp_socket(server_socket)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(backlog)
+        server_socket.setblocking(False)
+        return server_socket
+        
+    def _start_workers(self, workers):
+        """Fork worker processes that each accept on their own SO_REUSEPORT socket"""
+        if not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("Worker processes require os.fork() and SO_REUSEPORT (Linux)")
+        
+        # Pin each worker to one of the CPUs this process may run on
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self.running = True
+        for i in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                status = 0
+                try:
+                    self._run_worker(cpus[i % len(cpus)] if cpus else None)
+                except KeyboardInterrupt:
+                    pass
+                except Exception:
+                    traceback.print_exc()
+                    sys.stderr.flush()
+                    status = 1
+                finally:
+                    os._exit(status)
+            self.worker_pids.append(pid)
+        
+    def _run_worker(self, cpu):
+        """Accept and receive from any number of clients until interrupted (worker process)"""
+        # Turn the parent's SIGTERM from stop() into a clean KeyboardInterrupt exit
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        if cpu is not None:
+            os.sched_setaffinity(0, {cpu})
+        pid = os.getpid()
+        server_socket = self._create_listener(WORKER_BACKLOG)
+        selector = selectors.DefaultSelector()
+        selector.register(server_socket, selectors.EVENT_READ)
+        # The parent starts its log listener after forking, and its thread would not survive
+        # fork() anyway, so start one for this process unless logging was configured elsewhere
+        if not log.handlers or isinstance(log.handlers[0], _DeferredQueueHandler):
+            listener = start_log_listener()
+        else:
+            listener = None
+        log.info("Worker %d listening on %s:%s on CPU %s", pid, self.host, self.port, cpu)
+        
+        try:
+            self._worker_loop(pid, server_socket, selector)
+        finally:
+            if listener:
+                listener.stop()
+        
+    def _worker_loop(self, pid, server_socket, selector):
+        """Accept and receive loop of a worker process"""
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is server_socket:
                     try:
-                        data = self.client_socket.recv(1024)
-                        if not data:
-                            print("Client disconnected")
-                            break
-                        
-                        message = data.decode('utf-8')
-                        print(f"Received: {message}")
-                        
-                    except ConnectionResetError:
-                        print("Connection reset by client")
-                        break
-                    except Exception as e:
-                        print(f"Error receiving message: {e}")
-                        break
+                        client_socket, client_address = server_socket.accept()
+                    except BlockingIOError:
+                        continue
+                    client_socket.setblocking(False)
+                    tune_tcp_socket(client_socket)
+                    selector.register(client_socket, selectors.EVENT_READ, client_address)
+                    log.info("Worker %d connected to client: %s", pid, client_address)
+                    continue
                 
-                # Clean up client socket
-                if self.client_socket:
-                    self.client_socket.close()
-                    self.client_socket = None
-                    
-            except Exception as e:
-                print(f"Connection error: {e}")
-                if self.client_socket:
-                    self.client_socket.close()
-                    self.client_socket = None
-                time.sleep(1)  # Wait before retrying
+                client_socket = key.fileobj
+                try:
+                    nbytes = client_socket.recv_into(self._rxview, RECEIVE_BUFFER_SIZE)
+                except BlockingIOError:
+                    continue
+                except Exception as e:
+                    log.error("Worker %d error receiving message: %s", pid, e)
+                    nbytes = 0
                 
+                if not nbytes:
+                    log.info("Worker %d client disconnected: %s", pid, key.data)
+                    selector.unregister(client_socket)
+                    client_socket.close()
+                    continue
+                
+                message = str(self._rxview[:nbytes], 'utf-8', 'replace')
+                log.info("Worker %d received from %s: %s", pid, key.data, message)
+        
+    def serve_forever(self):
+        """Dispatch socket and user input events until the server is stopped"""
+        if self.worker_pids:
+            # Worker mode, the parent only waits for its children
+            for pid in self.worker_pids:
+                _, status = os.waitpid(pid, 0)
+                exitcode = os.waitstatus_to_exitcode(status)
+                if exitcode:
+                    log.error("Worker %d exited with status %d", pid, exitcode)
+            self.worker_pids = []
+            return
+        
+        while self.running:
+            for key, _ in self.selector.select():
+                key.data()
+                if not self.running:
+                    break
+                
+    def _do_wakeup(self):
+        """Drain the wakeup socket, serve_forever() then re-checks self.running"""
+        try:
+            self._wakeup_r.recv(64)
+        except BlockingIOError:
+            pass
+        
+    def _do_accept(self):
+        """Accept a new client connection"""
+        try:
+            client_socket, client_address = self.server_socket.accept()
+        except BlockingIOError:
+            return
+        except Exception as e:
+            log.error("Connection error: %s", e)
+            return
+        
+        client_socket.setblocking(False)
+        tune_tcp_socket(client_socket)
+        self.client_socket = client_socket
+        self.client_address = client_address
+        log.info("Connected to client: %s", self.client_address)
+        
+        # Only one client at a time, further connections wait in the listen backlog
+        self.selector.unregister(self.server_socket)
+        self.selector.register(self.client_socket, selectors.EVENT_READ, self._do_recv)
+        
+    def _do_recv(self):
+        """Receive messages from the connected client"""
+        try:
+            if fast_server is not None:
+                # C loop drains the socket, calling back once per received chunk
+                closed = fast_server.drain(self.client_socket.fileno(), self._on_message,
+                                           RECEIVE_BUFFER_SIZE) < 0
+            else:
+                nbytes = self.client_socket.recv_into(self._rxview, RECEIVE_BUFFER_SIZE)
+                closed = not nbytes
+                if nbytes:
+                    self._on_message(self._rxview[:nbytes])
+        except BlockingIOError:
+            return
+        except ConnectionResetError:
+            log.warning("Connection reset by client")
+            self._close_client()
+            return
+        except Exception as e:
+            log.error("Error receiving message: %s", e)
+            self._close_client()
+            return
+        
+        if closed:
+            log.info("Client disconnected")
+            self._close_client()
+        
+    def _on_message(self, data):
+        """Display a received message"""
+        message = str(data, 'utf-8', 'replace')
+        log.info("Received: %s", message)
+        
+    def _close_client(self):
+        """Clean up the client socket and go back to accepting connections"""
+        self.selector.unregister(self.client_socket)
+        self.client_socket.close()
+        self.client_socket = None
+        self.client_address = None
+        self.selector.register(self.server_socket, selectors.EVENT_READ, self._do_accept)
+        log.info("Waiting for connection...")
+        
+    def _do_command(self):
+        """Handle the user input available on stdin"""
+        lines = self._stdin_reader.read_lines()
+        if self._stdin_reader.closed:
+            # stdin closed, keep serving without user input
+            self.selector.unregister(sys.stdin)
+        self._handle_commands(lines)
+        
+    def _handle_commands(self, lines):
+        """Send each line of user input to the client, or stop on 'quit'"""
+        for message in lines:
+            if message.lower() == 'quit':
+                self.running = False
+                return
+            
+            if message:
+                self.send_message(message)
+            self._show_prompt()
+        
+    def _show_prompt(self):
+        """Write the input prompt after the log lines queued before it"""
+        for handler in log.handlers:
+            if isinstance(handler, _DeferredQueueHandler):
+                handler.queue.put_nowait(_PROMPT_MARK)
+                return
+        print(PROMPT, end='', flush=True)
+        
     def send_message(self, message):
         """Send a message to the connected client"""
         if self.client_socket:
             try:
                 self.client_socket.send(message.encode('utf-8'))
-                print(f"Sent: {message}")
+                log.info("Sent: %s", message)
                 return True
             except Exception as e:
-                print(f"Error sending message: {e}")
+                log.error("Error sending message: %s", e)
                 return False
         else:
-            print("No client connected")
+            log.warning("No client connected")
             return False
             
     def command_loop(self):
-        """Handle user input for sending messages"""
+        """Handle user input for sending messages (Windows only)"""
         while self.running:
             try:
-                message = input("Enter message to send (or 'quit' to exit): ")
+                message = input(PROMPT)
                 if message.lower() == 'quit':
-                    self.stop()
+                    self.running = False
+                    self._wakeup_w.send(b'\0')
                     break
                 
                 if message:
                     self.send_message(message)
                     
             except Exception as e:
-                print(f"Error in command loop: {e}")
+                log.error("Error in command loop: %s", e)
                 
     def stop(self):
         """Stop the TCP server"""
         self.running = False
+        for pid in self.worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.worker_pids = []
+        if self.selector:
+            self.selector.close()
+            self.selector = None
         if self.client_socket:
             self.client_socket.close()
+            self.client_socket = None
         if self.server_socket:
             self.server_socket.close()
-        print("Server stopped")
+            self.server_socket = None
+        if self._wakeup_r:
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+            self._wakeup_r = self._wakeup_w = None
+        log.info("Server stopped")
+        if self._log_listener:
+            self._log_listener.stop()
+            self._log_listener = None
 
 if __name__ == "__main__":
+    # Optional number of worker processes, e.g. python server_TCP.py 4
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
     # Create and start server
     server = TCPServer(host='192.168.50.194', port=8080)
     try:
-        server.start()
-        # Keep main thread alive
-        while True:
-            time.sleep(1)
+        server.start(workers)
+        server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down server...")
+    finally:
         server.stop()
-
-
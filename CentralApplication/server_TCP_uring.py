@@ -0,0 +1,297 @@
+"""
+server_TCP_uring.py
+
+This script implements the same single-client TCP server as server_TCP.py, but drives all
+socket and console I/O from one thread through a Linux io_uring instead of blocking calls
+in separate threads. Accepts, receives, sends and stdin reads are queued as submission
+entries and their completions are reaped in batches, so one io_uring_enter() call can
+cover many operations.
+
+Usage:
+1. Run the script using Python 3 on Linux.
+   Example: python server_TCP_uring.py
+2. The server will start and listen on the specified host and port (default: 0.0.0.0:8080).
+3. To send a message to the connected client, type the message in the command prompt and press Enter.
+4. To exit the server, type 'quit' and press Enter.
+
+Key Features:
+- Accepts only one client connection at a time, further connections are closed immediately.
+- A single multishot accept is armed on the registered listening socket.
+- Receives use a pool of kernel-selected provided buffers (IOSQE_BUFFER_SELECT).
+- The ring is created with IORING_SETUP_DEFER_TASKRUN, so completions are only processed
+  when the server waits for them, which keeps latency low without an SQPOLL thread.
+
+Dependencies:
+- Requires Python 3.x and Linux 6.1 or newer.
+- Requires the liburing Python bindings (pip install liburing).
+
+Note:
+- On older kernels that reject IORING_SETUP_DEFER_TASKRUN the ring is created without it.
+- For other platforms use server_TCP.py.
+"""
+
+import errno
+import socket
+
+from liburing import (Cqe, FileIndex, Ring, IORING_CQE_BUFFER_SHIFT, IORING_CQE_F_BUFFER,
+                      IORING_CQE_F_MORE, IORING_SETUP_DEFER_TASKRUN, IORING_SETUP_SINGLE_ISSUER,
+                      IOSQE_BUFFER_SELECT, IOSQE_FIXED_FILE, io_uring_cq_advance,
+                      io_uring_cqe_iter_init, io_uring_cqe_iter_next, io_uring_get_sqe,
+                      io_uring_prep_multishot_accept, io_uring_prep_provide_buffers,
+                      io_uring_prep_read, io_uring_prep_recv, io_uring_prep_send,
+                      io_uring_queue_exit, io_uring_queue_init, io_uring_register_files,
+                      io_uring_sqe_set_buf_group, io_uring_sqe_set_flags, io_uring_submit,
+                      io_uring_submit_and_wait)
+
+from server_TCP import tune_tcp_socket
+from stdin_lines import StdinLineReader
+
+QUEUE_DEPTH = 64
+BUFFER_COUNT = 64  # Number of provided receive buffers
+BUFFER_SIZE = 4096
+BUFFER_GROUP = 1
+STDIN_BUFFER_SIZE = 1024
+LISTEN_FILE_INDEX = 0  # Index of the listening socket in the registered file table
+PROMPT = "Enter message to send (or 'quit' to exit): "
+
+# Operation tags, stored in the low byte of each entry's user_data
+OP_ACCEPT = 1
+OP_RECV = 2
+OP_SEND = 3
+OP_STDIN = 4
+OP_PROVIDE = 5
+
+class URingTCPServer:
+    def __init__(self, host='0.0.0.0', port=8080):
+        self.host = host
+        self.port = port
+        self.server_socket = None
+        self.client_socket = None
+        self.client_address = None
+        self.running = False
+
+        self.ring = Ring()
+        self.cqe = Cqe()
+        self._ring_ready = False
+        self._files = None
+        # Receive buffer pool, handed to the kernel once and recycled after each completion
+        self._buffers = [bytearray(BUFFER_SIZE) for _ in range(BUFFER_COUNT)]
+        self._stdin_buf = bytearray(STDIN_BUFFER_SIZE)
+        self._stdin_reader = StdinLineReader(0)
+        # Connection counter, used to discard completions belonging to a previous client
+        self._conn_id = 0
+        # Outgoing payloads must stay alive until their send completes
+        self._send_seq = 0
+        self._pending_sends = {}
+
+    def start(self):
+        """Start the TCP server"""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Allow port reuse
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        tune_tcp_socket(self.server_socket)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(1)
+
+        try:
+            io_uring_queue_init(QUEUE_DEPTH, self.ring,
+                                IORING_SETUP_SINGLE_ISSUER | IORING_SETUP_DEFER_TASKRUN)
+        except OSError:
+            # Kernel older than 6.1, fall back to a default ring
+            io_uring_queue_init(QUEUE_DEPTH, self.ring)
+        self._ring_ready = True
+
+        # Register the listening socket so accepts skip the per-operation file lookup
+        self._files = FileIndex([self.server_socket.fileno()])
+        io_uring_register_files(self.ring, self._files)
+
+        for bid in range(BUFFER_COUNT):
+            self._provide_buffer(bid)
+        self._prep_accept()
+        self._prep_stdin_read()
+        self.running = True
+
+        print(f"Server listening on {self.host}:{self.port}")
+        print(PROMPT, end='', flush=True)
+
+    def run(self):
+        """Submit queued operations and process completions until the server is stopped"""
+        while self.running:
+            io_uring_submit_and_wait(self.ring, 1)
+            # Reap every available completion before advancing the queue once
+            seen = 0
+            cqe_iter = io_uring_cqe_iter_init(self.ring)
+            while io_uring_cqe_iter_next(cqe_iter, self.cqe):
+                entry = self.cqe[0]
+                self._handle_completion(entry.user_data, entry.res, entry.flags)
+                seen += 1
+            io_uring_cq_advance(self.ring, seen)
+
+    def send_message(self, message):
+        """Send a message to the connected client"""
+        if self.client_socket:
+            data = message.encode('utf-8')
+            self._send_seq += 1
+            self._pending_sends[self._send_seq] = data
+            sqe = self._get_sqe()
+            io_uring_prep_send(sqe, self.client_socket.fileno(), data)
+            sqe.user_data = (self._send_seq << 8) | OP_SEND
+            print(f"Sent: {message}")
+            return True
+        else:
+            print("No client connected")
+            return False
+
+    def stop(self):
+        """Stop the TCP server"""
+        self.running = False
+        self._close_client()
+        if self._ring_ready:
+            io_uring_queue_exit(self.ring)
+            self._ring_ready = False
+        if self.server_socket:
+            self.server_socket.close()
+            self.server_socket = None
+        print("Server stopped")
+
+    def _get_sqe(self):
+        """Get a free submission entry, flushing the queue first if it is full"""
+        sqe = io_uring_get_sqe(self.ring)
+        if not sqe:
+            io_uring_submit(self.ring)
+            sqe = io_uring_get_sqe(self.ring)
+        return sqe
+
+    def _provide_buffer(self, bid):
+        """Hand a receive buffer (back) to the kernel"""
+        sqe = self._get_sqe()
+        io_uring_prep_provide_buffers(sqe, self._buffers[bid], 1, BUFFER_GROUP, bid)
+        sqe.user_data = OP_PROVIDE
+
+    def _prep_accept(self):
+        """Arm a multishot accept on the registered listening socket"""
+        sqe = self._get_sqe()
+        io_uring_prep_multishot_accept(sqe, LISTEN_FILE_INDEX)
+        io_uring_sqe_set_flags(sqe, IOSQE_FIXED_FILE)
+        sqe.user_data = OP_ACCEPT
+
+    def _prep_recv(self):
+        """Queue a receive on the client socket, the kernel picks the buffer from the pool"""
+        sqe = self._get_sqe()
+        io_uring_prep_recv(sqe, self.client_socket.fileno())
+        io_uring_sqe_set_flags(sqe, IOSQE_BUFFER_SELECT)
+        io_uring_sqe_set_buf_group(sqe, BUFFER_GROUP)
+        sqe.user_data = (self._conn_id << 8) | OP_RECV
+
+    def _prep_stdin_read(self):
+        """Queue a read of the next chunk of user input"""
+        sqe = self._get_sqe()
+        io_uring_prep_read(sqe, 0, self._stdin_buf)
+        sqe.user_data = OP_STDIN
+
+    def _close_client(self):
+        """Close the client connection, waking up any receive still in flight"""
+        if self.client_socket:
+            try:
+                self.client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.client_socket.close()
+            self.client_socket = None
+            self.client_address = None
+
+    def _handle_completion(self, user_data, res, flags):
+        """Dispatch one completion entry to its handler"""
+        op = user_data & 0xff
+        tag = user_data >> 8
+        if op == OP_ACCEPT:
+            self._on_accept(res, flags)
+        elif op == OP_RECV:
+            self._on_recv(tag, res, flags)
+        elif op == OP_SEND:
+            self._pending_sends.pop(tag, None)
+            if res < 0:
+                print(f"Error sending message: {errno.errorcode.get(-res, res)}")
+        elif op == OP_STDIN:
+            self._on_stdin(res)
+        elif op == OP_PROVIDE and res < 0:
+            print(f"Error providing receive buffer: {errno.errorcode.get(-res, res)}")
+
+    def _on_accept(self, res, flags):
+        """Handle an accepted connection"""
+        if res < 0:
+            print(f"Connection error: {errno.errorcode.get(-res, res)}")
+        else:
+            self._add_client(socket.socket(fileno=res))
+
+        # A multishot accept stays armed until the kernel clears IORING_CQE_F_MORE
+        if not flags & IORING_CQE_F_MORE and self.running:
+            self._prep_accept()
+
+    def _add_client(self, client_socket):
+        """Take over an accepted connection, or close it if a client is already connected"""
+        try:
+            client_address = client_socket.getpeername()
+        except OSError as e:
+            # The client reset the connection before it was handled
+            print(f"Connection error: {e}")
+            client_socket.close()
+            return
+
+        if self.client_socket:
+            print(f"Rejected client {client_address}, already connected")
+            client_socket.close()
+        else:
+            self._conn_id += 1
+            self.client_socket = client_socket
+            self.client_address = client_address
+            tune_tcp_socket(self.client_socket)
+            print(f"\nConnected to client: {self.client_address}")
+            self._prep_recv()
+
+    def _on_recv(self, conn_id, res, flags):
+        """Handle received data from the client"""
+        bid = flags >> IORING_CQE_BUFFER_SHIFT if flags & IORING_CQE_F_BUFFER else None
+        try:
+            if conn_id != self._conn_id or not self.client_socket:
+                return  # Completion for a connection that is already closed
+
+            if res > 0:
+                message = str(memoryview(self._buffers[bid])[:res], 'utf-8', 'replace')
+                print(f"\nReceived: {message}")
+                self._prep_recv()
+            elif res == 0:
+                print("\nClient disconnected")
+                self._close_client()
+            elif res == -errno.ENOBUFS:
+                self._prep_recv()  # Pool exhausted, buffers are recycled below
+            else:
+                print(f"\nError receiving message: {errno.errorcode.get(-res, res)}")
+                self._close_client()
+        finally:
+            if bid is not None:
+                self._provide_buffer(bid)
+
+    def _on_stdin(self, res):
+        """Handle a chunk of user input"""
+        data = bytes(memoryview(self._stdin_buf)[:res]) if res > 0 else b''
+        for message in self._stdin_reader.feed(data):
+            if message.lower() == 'quit':
+                self.running = False
+                return
+            if message:
+                self.send_message(message)
+            print(PROMPT, end='', flush=True)
+        if not self._stdin_reader.closed:
+            self._prep_stdin_read()  # Otherwise stdin is closed, stop reading commands
+
+if __name__ == "__main__":
+    # Create and start server
+    server = URingTCPServer(host='192.168.50.194', port=8080)
+    try:
+        server.start()
+        server.run()
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
+    finally:
+        server.stop()
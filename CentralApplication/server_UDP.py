@@ -1,7 +1,25 @@
+import asyncio
+import collections
 import socket
-import threading
+import sys
 import time
 from datetime import datetime
+from stdin_lines import StdinLineReader
+from udp_batch import UDPBatchReceiver, UDPBatchSender, send_gso
+
+try:
+    import uvloop  # Optional libuv-based event loop (pip install uvloop)
+except ImportError:
+    uvloop = None
+
+LOG_QUEUE_SIZE = 4096  # Oldest entries are dropped if stdout falls this far behind
+
+# Pre-encoded fragments of the received-message log line
+_LOG_OPEN = b"\n["
+_LOG_FROM = b"] Received from "
+_LOG_SEP = b": "
+_LOG_END = b"\n"
+_LOG_PROMPT = b"> "
 
 class UDPCommunicator:
     def __init__(self):
@@ -9,81 +27,215 @@ class UDPCommunicator:
         self.pico_ip = "192.168.50.50"
         self.pico_port = 5001
         self.listen_port = 5000  # Port to listen for messages from Pico
+        self.pico_addr = (self.pico_ip, self.pico_port)  # Destination tuple, built once
         
-        self.running = False
         self.sock = None
+        self.receiver = None
+        self.sender = None
+        self.loop = None
+        self._done = None
+        # Reused [header, payload] list for scatter-gather sends
+        self._iov_parts = [b"", b""]
+        # Received messages are queued and written to stdout in one batch per loop iteration
+        self._logq = collections.deque(maxlen=LOG_QUEUE_SIZE)
+        self._flush_scheduled = False
+        self._last_second = None
+        self._timestamp = b""
+        self._ip_cache = {}
+        self._stdin_reader = None
     
     def start(self):
-        """Start the UDP communication"""
+        """Start the UDP communication and run until 'quit'"""
+        if sys.platform == 'win32':
+            # The default Proactor loop has no add_reader(), use the selector-based one
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        if uvloop is not None and hasattr(uvloop, "run"):
+            uvloop.run(self._run())
+        elif uvloop is not None:
+            # uvloop older than 0.18 has no run(), install its loop policy instead
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            asyncio.run(self._run())
+        else:
+            asyncio.run(self._run())
+    
+    async def _run(self):
+        """Set up the socket and event loop callbacks, then wait until stopped"""
+        self.loop = asyncio.get_running_loop()
+        self._done = asyncio.Event()
+        
         # Create and bind the socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(('0.0.0.0', self.listen_port))
-        self.running = True
-        
-        # Start receiver thread
-        self.receiver_thread = threading.Thread(target=self._receive_messages)
-        self.receiver_thread.daemon = True
-        self.receiver_thread.start()
+        # Fix the peer once: the kernel caches the route and only delivers datagrams from the Pico
+        self.sock.connect(self.pico_addr)
+        self.sock.setblocking(False)
+        # Preallocate the batched receive buffers (recvmmsg on Linux)
+        self.receiver = UDPBatchReceiver(self.sock)
+        # Lines of user input that arrive together are sent in one batch (sendmmsg on Linux)
+        self.sender = UDPBatchSender(self.sock)
+        self.loop.add_reader(self.sock.fileno(), self._receive_messages)
         
         print(f"[{self._get_timestamp()}] Started UDP communication")
         print(f"Listening on port {self.listen_port}")
         print(f"Sending to Pico W at {self.pico_ip}:{self.pico_port}")
         print("\nType your messages (or 'quit' to exit):")
         
-        self._handle_user_input()
+        if sys.platform == 'win32':
+            # Windows cannot wait on stdin in the event loop, read it in the default executor
+            self.loop.create_task(self._read_input_windows())
+        else:
+            self._stdin_reader = StdinLineReader()
+            print("> ", end='', flush=True)
+            try:
+                self.loop.add_reader(sys.stdin.fileno(), self._handle_user_input)
+            except PermissionError:
+                # epoll rejects a regular file or /dev/null, reads from it never block,
+                # so handle all of it now and keep receiving without user input
+                self._handle_lines(self._stdin_reader.read_remaining())
+        
+        await self._done.wait()
     
     def stop(self):
         """Stop the UDP communication"""
-        self.running = False
+        if self.loop and not self.loop.is_closed():
+            if self.sock:
+                self.loop.remove_reader(self.sock.fileno())
+            if sys.platform != 'win32':
+                self.loop.remove_reader(sys.stdin.fileno())
         if self.sock:
             self.sock.close()
+            self.sock = None
+        if self._done:
+            self._done.set()
     
     def _get_timestamp(self):
         """Get current timestamp for logging"""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     def _receive_messages(self):
-        """Handle incoming messages from Pico"""
-        while self.running:
-            try:
-                data, addr = self.sock.recvfrom(1024)
-                message = data.decode('utf-8')
-                print(f"\n[{self._get_timestamp()}] Received from {addr[0]}: {message}")
-                print("> ", end='', flush=True)  # Restore input prompt
-                
-            except socket.error as e:
-                if self.running:  # Only print error if we're still meant to be running
-                    print(f"\nSocket error: {e}")
-                break
-            except Exception as e:
-                print(f"\nError: {e}")
+        """Handle incoming messages from Pico, called when the socket is readable"""
+        try:
+            # Pull every pending datagram in one go
+            messages = self.receiver.recv_many(block=False)
+        except ConnectionRefusedError:
+            # ICMP port unreachable from an earlier send, the Pico is not listening yet
+            return
+        except socket.error as e:
+            print(f"\nSocket error: {e}")
+            self.stop()
+            return
+        
+        if messages:
+            now = time.time_ns()
+            for data, addr in messages:
+                self._logq.append((now, addr[0], data))
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                self.loop.call_soon(self._log_messages)
+    
+    def _log_messages(self):
+        """Write queued received messages to stdout in one batch"""
+        self._flush_scheduled = False
+        chunks = []
+        while self._logq:
+            stamp_ns, ip, data = self._logq.popleft()
+            # The timestamp only has second resolution, so format it once per second
+            second = stamp_ns // 1_000_000_000
+            if second != self._last_second:
+                self._last_second = second
+                self._timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S").encode()
+            ip_bytes = self._ip_cache.get(ip)
+            if ip_bytes is None:
+                ip_bytes = self._ip_cache[ip] = ip.encode()
+            chunks += (_LOG_OPEN, self._timestamp, _LOG_FROM, ip_bytes, _LOG_SEP, data, _LOG_END)
+        
+        if chunks:
+            chunks.append(_LOG_PROMPT)  # Restore input prompt
+            sys.stdout.flush()  # Keep ordering with text already printed through print()
+            out = sys.stdout.buffer
+            out.write(b"".join(chunks))
+            out.flush()
     
-    def send_message(self, message):
-        """Send message to Pico"""
+    def send_message(self, message, header=b""):
+        """Send message to Pico, optionally prefixed with a raw header"""
         try:
-            self.sock.sendto(message.encode('utf-8'), (self.pico_ip, self.pico_port))
+            self._iov_parts[0] = header
+            self._iov_parts[1] = message.encode('utf-8')
+            self.send_parts(self._iov_parts)
             print(f"[{self._get_timestamp()}] Sent: {message}")
         except Exception as e:
             print(f"Error sending message: {e}")
     
+    def send_parts(self, parts):
+        """Send a list of byte strings to Pico as one datagram, without joining them first"""
+        if hasattr(self.sock, "sendmsg"):
+            self.sock.sendmsg(parts)
+        else:
+            # No sendmsg() on Windows
+            self.sock.send(b"".join(parts))
+    
     def _handle_user_input(self):
-        """Handle user input for sending messages"""
-        while self.running:
+        """Handle the user input available on stdin, called when stdin is readable"""
+        lines = self._stdin_reader.read_lines()
+        if self._stdin_reader.closed:
+            # stdin closed, keep receiving without user input
+            self.loop.remove_reader(sys.stdin.fileno())
+        self._handle_lines(lines)
+    
+    def _handle_lines(self, lines):
+        """Handle lines of user input, prompting for the next one until stdin is closed"""
+        batch = []
+        for message in lines:
+            if message.lower() == 'quit':
+                self._send_batch(batch)
+                self.stop()
+                return
+            if message:  # Only send if message is not empty
+                batch.append(message)
+        self._send_batch(batch)
+        if not self._stdin_reader.closed:
+            print("> ", end='', flush=True)
+    
+    def _send_batch(self, messages):
+        """Send messages read together (pasted or piped input) in as few syscalls as possible"""
+        if len(messages) <= 1:
+            for message in messages:
+                self.send_message(message)
+            return
+        
+        packets = [message.encode('utf-8') for message in messages]
+        try:
+            if packets.count(packets[0]) == len(packets):
+                # The same message repeated (e.g. piped from `yes`), let UDP GSO split it up
+                send_gso(self.sock, packets[0], len(packets))
+            else:
+                self.sender.send_many(packets)
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return
+        timestamp = self._get_timestamp()
+        print("\n".join(f"[{timestamp}] Sent: {message}" for message in messages))
+    
+    async def _read_input_windows(self):
+        """Handle user input for sending messages (Windows only)"""
+        while not self._done.is_set():
             try:
-                message = input("> ")
-                
-                if message.lower() == 'quit':
-                    self.stop()
-                    break
-                
-                if message:  # Only send if message is not empty
-                    self.send_message(message)
-                    
-            except KeyboardInterrupt:
+                message = await self.loop.run_in_executor(None, input, "> ")
+            except EOFError:
                 self.stop()
                 break
-            except Exception as e:
-                print(f"Error: {e}")
+            if not self._handle_command(message):
+                break
+    
+    def _handle_command(self, message):
+        """Send a message, or stop on 'quit'. Returns False once stopped"""
+        if message.lower() == 'quit':
+            self.stop()
+            return False
+        
+        if message:  # Only send if message is not empty
+            self.send_message(message)
+        return True
 
 def main():
     communicator = UDPCommunicator()
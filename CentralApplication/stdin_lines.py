@@ -0,0 +1,56 @@
+"""
+stdin_lines.py
+This module provides the user input line splitting shared by the Central Application scripts
+that wait on stdin in an event loop instead of blocking in input().
+When the loop reports stdin as readable, sys.stdin.readline() pulls every line that is already
+available into its own buffer but returns only the first one, and the loop is never woken up
+for the rest. StdinLineReader reads the raw file descriptor instead and returns all complete
+lines, keeping a trailing partial line until its newline arrives.
+Example:
+    from stdin_lines import StdinLineReader
+    reader = StdinLineReader()
+    # From a selector or event loop callback, when stdin is readable:
+    for line in reader.read_lines():
+        print(line)
+    if reader.closed:
+        pass  # End of input, stop waiting on stdin
+Dependencies:
+- Requires Python 3.x.
+- No external libraries are needed beyond the standard library.
+Note:
+- feed() splits data that was read by other means, e.g. an io_uring read completion.
+- At end of input a last unterminated line is returned as well.
+- Lines are decoded as UTF-8 (invalid bytes are replaced) without their line ending.
+"""
+import os
+import sys
+
+READ_SIZE = 4096
+
+class StdinLineReader:
+    def __init__(self, fd=None):
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.closed = False
+        self._pending = b''
+
+    def feed(self, data):
+        """Split data into complete lines, an empty data marks the end of input"""
+        if not data:
+            self.closed = True
+            lines = [self._pending] if self._pending else []
+            self._pending = b''
+        else:
+            *lines, self._pending = (self._pending + data).split(b'\n')
+        return [line.decode('utf-8', 'replace').rstrip('\r') for line in lines]
+
+    def read_lines(self):
+        """Read once from the fd and return the complete lines, call when it is readable"""
+        return self.feed(os.read(self.fd, READ_SIZE))
+
+    def read_remaining(self):
+        """Read up to the end of input and return all lines. For stdin that cannot be polled
+        (a regular file or /dev/null), where reads never block."""
+        lines = []
+        while not self.closed:
+            lines += self.read_lines()
+        return lines
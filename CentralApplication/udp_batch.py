@@ -0,0 +1,265 @@
+"""
+udp_batch.py
+This module provides batched UDP helpers for the Central Application scripts.
+Sending or receiving one datagram per sendto()/recvfrom() call costs one user/kernel crossing
+per packet, which dominates the cost of small messages at high rates. On Linux, sendmmsg(2)
+and recvmmsg(2) move a whole array of datagrams in a single syscall, so this module wraps
+them via ctypes.
+Example:
+    from udp_batch import UDPBatchSender, UDPBatchReceiver
+    sender = UDPBatchSender(sock, ('192.168.50.50', 5001))
+    sender.send_many([b'Yo from PC!'] * 100)
+    # On a connected socket the destination can be left out
+    UDPBatchSender(connected_sock).send_many([b'one', bytearray(b'two')])
+    receiver = UDPBatchReceiver(sock)
+    for data, addr in receiver.recv_many():
+        print(addr, data)
+    # From an event loop reader callback, on a non-blocking socket:
+    messages = receiver.recv_many(block=False)
+    send_gso(sock, b'Yo from PC!', 100, ('192.168.50.50', 5001))
+Dependencies:
+- Requires Python 3.x.
+- No external libraries are needed beyond the standard library.
+Note:
+- sendmmsg() is only used on Linux. On other platforms (and for single datagrams, where a
+  plain sendto() is marginally faster) the sender falls back to a sendto() loop.
+- recvmmsg() is only used on Linux. On other platforms the receiver falls back to a single
+  recvfrom() per call.
+- Only IPv4 sockets are supported by the sendmmsg()/recvmmsg() paths.
+- send_gso() uses UDP generic segmentation offload (Linux 4.18+): many equally sized
+  datagrams are passed to the kernel as one buffer and split further down the stack.
+  Where UDP_SEGMENT is unavailable or rejected it falls back to one sendto() per datagram.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import struct
+import sys
+
+# Maximum number of datagrams submitted per sendmmsg() call
+DEFAULT_BATCH_SIZE = 100
+
+# Maximum number of datagrams pulled per recvmmsg() call, and the size of each slot
+DEFAULT_RECV_BATCH_SIZE = 32
+DEFAULT_RECV_BUFFER_SIZE = 1500
+ADDR_CACHE_SIZE = 256  # Parsed source addresses kept by a receiver before the cache is reset
+
+# UDP_SEGMENT from <netinet/udp.h>, not exported by every Python version
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103 if sys.platform.startswith("linux") else None)
+GSO_MAX_SEGMENTS = 64  # Kernel limit of segments per GSO send
+GSO_MAX_BYTES = 65507  # A GSO buffer must still fit in one UDP datagram
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IOVec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr),
+                ("msg_len", ctypes.c_uint)]
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort),
+                ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_uint32),  # Network byte order
+                ("sin_zero", ctypes.c_uint8 * 8)]
+
+def _load_libc():
+    """Load libc with errno tracking, or return None if unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "sendmmsg") or not hasattr(libc, "recvmmsg"):
+        return None
+    return libc
+
+_libc = _load_libc()
+if _libc is not None:
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+    _recvmmsg = _libc.recvmmsg
+    _recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int,
+                          ctypes.c_void_p]
+    _recvmmsg.restype = ctypes.c_int
+else:
+    _sendmmsg = None
+    _recvmmsg = None
+
+def _make_sockaddr_in(addr):
+    """Build a sockaddr_in for an (ip, port) tuple"""
+    sa = _SockAddrIn()
+    sa.sin_family = socket.AF_INET
+    sa.sin_port = socket.htons(addr[1])
+    sa.sin_addr = int.from_bytes(socket.inet_aton(addr[0]), sys.byteorder)
+    return sa
+
+def send_gso(sock, payload_unit, count, addr=None):
+    """Send count copies of payload_unit as separate datagrams, using as few sendmsg() calls as
+    UDP GSO allows. addr may be None for a connected socket. Returns the number of datagrams sent."""
+    unit_len = len(payload_unit)
+    if UDP_SEGMENT is None or count <= 1 or unit_len == 0 or unit_len > GSO_MAX_BYTES:
+        return _send_copies(sock, payload_unit, count, addr)
+
+    per_call = min(count, GSO_MAX_SEGMENTS, GSO_MAX_BYTES // unit_len)
+    buf = payload_unit * per_call
+    ancdata = [(socket.IPPROTO_UDP, UDP_SEGMENT, struct.pack("H", unit_len))]
+    sent = 0
+    try:
+        while sent < count:
+            segments = min(per_call, count - sent)
+            data = buf if segments == per_call else buf[:segments * unit_len]
+            if addr is None:
+                sock.sendmsg([data], ancdata)
+            else:
+                sock.sendmsg([data], ancdata, 0, addr)
+            sent += segments
+    except OSError as e:
+        # Kernel or device without UDP GSO support
+        if e.errno not in (errno.EINVAL, errno.EIO, errno.ENOPROTOOPT, errno.EOPNOTSUPP):
+            raise
+        sent += _send_copies(sock, payload_unit, count - sent, addr)
+    return sent
+
+def _send_copies(sock, payload_unit, count, addr):
+    """Send count copies of payload_unit with one syscall each"""
+    for _ in range(count):
+        if addr is None:
+            sock.send(payload_unit)
+        else:
+            sock.sendto(payload_unit, addr)
+    return count
+
+class UDPBatchSender:
+    def __init__(self, sock, addr=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.sock = sock
+        self.addr = addr
+        self.batch_size = batch_size
+        self._use_sendmmsg = _sendmmsg is not None and sock.family == socket.AF_INET
+
+        if self._use_sendmmsg:
+            # Preallocate the message vector once and reuse it for every call.
+            # All slots share the same destination address, none for a connected socket.
+            self._sockaddr = _make_sockaddr_in(addr) if addr is not None else None
+            self._iov = (_IOVec * batch_size)()
+            self._msgvec = (_MMsgHdr * batch_size)()
+            for i in range(batch_size):
+                hdr = self._msgvec[i].msg_hdr
+                if self._sockaddr is not None:
+                    hdr.msg_name = ctypes.addressof(self._sockaddr)
+                    hdr.msg_namelen = ctypes.sizeof(self._sockaddr)
+                hdr.msg_iov = ctypes.pointer(self._iov[i])
+                hdr.msg_iovlen = 1
+
+    def send_many(self, packets):
+        """Send a sequence of bytes-like objects as individual datagrams, returns the number sent"""
+        if not self._use_sendmmsg or len(packets) == 1:
+            for packet in packets:
+                if self.addr is None:
+                    self.sock.send(packet)
+                else:
+                    self.sock.sendto(packet, self.addr)
+            return len(packets)
+
+        fd = self.sock.fileno()
+        sent = 0
+        while sent < len(packets):
+            # c_char_p only borrows the buffer of a bytes object, copy other bytes-like types.
+            # The chunk list keeps the copies alive until sendmmsg() returns.
+            chunk = [packet if type(packet) is bytes else bytes(packet)
+                     for packet in packets[sent:sent + self.batch_size]]
+            for i, packet in enumerate(chunk):
+                self._iov[i].iov_base = ctypes.cast(ctypes.c_char_p(packet), ctypes.c_void_p)
+                self._iov[i].iov_len = len(packet)
+
+            # sendmmsg() may send fewer datagrams than requested, so retry the remainder
+            count = _sendmmsg(fd, self._msgvec, len(chunk), 0)
+            if count < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+            sent += count
+        return sent
+
+class UDPBatchReceiver:
+    def __init__(self, sock, batch_size=DEFAULT_RECV_BATCH_SIZE, bufsize=DEFAULT_RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.batch_size = batch_size
+        self.bufsize = bufsize
+        self._use_recvmmsg = _recvmmsg is not None and sock.family == socket.AF_INET
+        # Parsed (ip, port) tuples keyed by the raw address, peers rarely change.
+        # Bounded, an unconnected socket may hear from any number of ports.
+        self._addr_cache = {}
+
+        if self._use_recvmmsg:
+            # Preallocate the receive buffers, source address slots and message vector once,
+            # they are reused for every call
+            self._bufs = [ctypes.create_string_buffer(bufsize) for _ in range(batch_size)]
+            self._addrs = (_SockAddrIn * batch_size)()
+            self._iov = (_IOVec * batch_size)()
+            self._msgvec = (_MMsgHdr * batch_size)()
+            for i in range(batch_size):
+                self._iov[i].iov_base = ctypes.addressof(self._bufs[i])
+                hdr = self._msgvec[i].msg_hdr
+                hdr.msg_name = ctypes.addressof(self._addrs[i])
+                hdr.msg_iov = ctypes.pointer(self._iov[i])
+                hdr.msg_iovlen = 1
+        else:
+            self._buf = bytearray(bufsize)
+            self._view = memoryview(self._buf)
+
+    def recv_many(self, block=True):
+        """Return a list of (data, (ip, port)) tuples, waiting for data first if block is set.
+        With block=False an empty list is returned when nothing is pending."""
+        if not self._use_recvmmsg:
+            try:
+                nbytes, addr = self.sock.recvfrom_into(self._view, self.bufsize)
+            except BlockingIOError:
+                return []
+            return [(bytes(self._view[:nbytes]), addr)]
+
+        fd = self.sock.fileno()
+        if fd < 0:
+            raise OSError(errno.EBADF, os.strerror(errno.EBADF))
+        if block:
+            select.select([fd], [], [])
+
+        # The kernel overwrites the buffer and address lengths, restore them for this round
+        for i in range(self.batch_size):
+            self._iov[i].iov_len = self.bufsize
+            self._msgvec[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+
+        count = _recvmmsg(fd, self._msgvec, self.batch_size, socket.MSG_DONTWAIT, None)
+        if count < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            raise OSError(err, os.strerror(err))
+
+        messages = []
+        for i in range(count):
+            sa = self._addrs[i]
+            key = (sa.sin_addr << 16) | sa.sin_port
+            addr = self._addr_cache.get(key)
+            if addr is None:
+                if len(self._addr_cache) >= ADDR_CACHE_SIZE:
+                    self._addr_cache.clear()
+                addr = self._addr_cache[key] = (
+                    socket.inet_ntoa(sa.sin_addr.to_bytes(4, sys.byteorder)),
+                    socket.ntohs(sa.sin_port))
+            data = ctypes.string_at(self._bufs[i], self._msgvec[i].msg_len)
+            messages.append((data, addr))
+        return messages